@@ -1,4 +1,7 @@
 import json
+from collections import defaultdict
+
+import numpy as np
 
 
 # This script generates an HTML file to visualize the hexagonal grid and its connections.
@@ -15,65 +18,56 @@ def generate_hexagon_board_details(radius):
     """
     print("Generating hexagon data using robust axial coordinate method...")
 
-    # 1. Generate a set of all valid axial coordinates for the given radius
-    axial_coords = set()
-    for q in range(-radius, radius + 1):
-        for r in range(-radius, radius + 1):
-            if abs(q) + abs(r) + abs(-q - r) <= radius * 2:
-                axial_coords.add((q, r))
+    # 1. Generate all valid axial coordinates for the given radius as a meshgrid mask
+    Q, R_arr = np.meshgrid(np.arange(-radius, radius + 1), np.arange(-radius, radius + 1), indexing='ij')
+    cube_z = -Q - R_arr
+    valid = (np.abs(Q) + np.abs(R_arr) + np.abs(cube_z)) <= radius * 2
+    qs, rs = Q[valid], R_arr[valid]
 
     # 2. Convert axial coordinates to an "even-q" offset system for rendering
-    def axial_to_offset(q, r):
-        col = q
-        row = r + (q - (q & 1)) // 2
-        return (row, col)
-
-    offset_coords_unnormalized = {axial_to_offset(q, r) for q, r in axial_coords}
+    cols = qs
+    rows = rs + (qs - (qs & 1)) // 2
 
     # 3. Normalize the offset coordinates to start from (0,0) for easier use
-    if not offset_coords_unnormalized:
+    if qs.size == 0:
         return {}, {}, 0
 
-    min_r = min(cell[0] for cell in offset_coords_unnormalized)
-    min_c = min(cell[1] for cell in offset_coords_unnormalized)
-    valid_cells = {(r - min_r, c - min_c) for r, c in offset_coords_unnormalized}
+    rows, cols = rows - rows.min(), cols - cols.min()
 
-    # 4. Create mappings between all three coordinate systems for lookups
-    offset_to_axial_map = {}
-    axial_to_offset_map = {}
-    for q, r in axial_coords:
-        norm_offset = (axial_to_offset(q, r)[0] - min_r, axial_to_offset(q, r)[1] - min_c)
-        offset_to_axial_map[norm_offset] = (q, r)
-        axial_to_offset_map[(q, r)] = norm_offset
+    # 4. Index the tiles column by column, top to bottom, and store the indices in a
+    #    dense (q, r) lookup table padded by one cell so neighbor lookups never leave it
+    order = np.lexsort((rows, cols))
+    qs, rs, rows, cols = qs[order], rs[order], rows[order], cols[order]
+    sorted_axial = list(zip(qs.tolist(), rs.tolist()))
+    sorted_coords = list(zip(rows.tolist(), cols.tolist()))
+    shift = radius + 1
+    axial_to_index = -np.ones((2 * radius + 3, 2 * radius + 3), dtype=np.int16)
+    axial_to_index[qs + shift, rs + shift] = np.arange(len(sorted_axial))
 
     # 5. Build the adjacency map using the simple and foolproof axial system
     axial_directions = [(+1, 0), (+1, -1), (0, -1), (-1, 0), (-1, +1), (0, +1)]
-    adjacency_map_by_coord = {cell: [cell] for cell in valid_cells}
-    for cell_offset in valid_cells:
-        start_axial = offset_to_axial_map[cell_offset]
+    adj_map_indices = {}
+    for index, (q, r) in enumerate(sorted_axial):
+        neighbors = [index]
         for dq, dr in axial_directions:
-            neighbor_axial = (start_axial[0] + dq, start_axial[1] + dr)
-            if neighbor_axial in axial_to_offset_map:
-                neighbor_offset = axial_to_offset_map[neighbor_axial]
-                adjacency_map_by_coord[cell_offset].append(neighbor_offset)
-
-    # 6. Create index-based mappings for the solver/frontend
-    sorted_coords = sorted(list(valid_cells), key=lambda item: (item[1], item[0]))
-    coord_to_index = {coord: i for i, coord in enumerate(sorted_coords)}
-    adj_map_indices = {
-        coord_to_index[coord]: sorted([coord_to_index[n] for n in neighbors])
-        for coord, neighbors in adjacency_map_by_coord.items()
-    }
-
-    # 7. Create rendering map for the visualizer
+            neighbor_index = axial_to_index[q + shift + dq, r + shift + dr]
+            if neighbor_index >= 0:
+                neighbors.append(int(neighbor_index))
+        adj_map_indices[index] = sorted(neighbors)
+
+    # 6. Create rendering map for the visualizer
     render_map = {}
     unique_cols = sorted(list(set(c for r, c in sorted_coords)))
     col_to_c_idx = {c_val: i for i, c_val in enumerate(unique_cols)}
-    rows_in_col = {c: sorted([r_val for r_val, c_val in sorted_coords if c_val == c]) for c in unique_cols}
+    rows_in_col = defaultdict(list)
     for r, c in sorted_coords:
-        index = coord_to_index[(r, c)]
+        rows_in_col[c].append(r)
+    for c in rows_in_col:
+        rows_in_col[c].sort()
+    row_idx_lookup = {c: {r_val: i for i, r_val in enumerate(col_rows)} for c, col_rows in rows_in_col.items()}
+    for index, (r, c) in enumerate(sorted_coords):
         c_idx = col_to_c_idx[c]
-        r_idx = rows_in_col[c].index(r)
+        r_idx = row_idx_lookup[c][r]
         render_map[index] = (c_idx, r_idx)
 
     return adj_map_indices, render_map, len(unique_cols)
@@ -84,10 +78,13 @@ def generate_hexagon_board_details(radius):
 def create_visualizer_html(adj_map, render_map, num_cols):
     """Generates the full HTML content with an enhanced auto-tester."""
     adj_map_json = json.dumps(adj_map)
+    # Reverse of RENDER_MAP so the mini-grids can find the tile at a render position directly
+    pos_to_index = {f"{c},{r}": i for i, (c, r) in render_map.items()}
 
     javascript_code = f"""
         const ADJACENCY_MAP = {adj_map_json};
         const RENDER_MAP = {json.dumps(render_map)};
+        const POS_TO_INDEX = {json.dumps(pos_to_index)};
         const NUM_COLS = {num_cols};
         const NUM_TILES = Object.keys(RENDER_MAP).length;
 
@@ -185,13 +182,7 @@ def create_visualizer_html(adj_map, render_map, num_cols):
                     const targetRow = centerRow + r_offset;
 
                     // Find if a tile exists at this render position
-                    let tileIndex = -1;
-                    for (const [idx, pos] of Object.entries(RENDER_MAP)) {{
-                        if (pos[0] === targetCol && pos[1] === targetRow) {{
-                            tileIndex = parseInt(idx, 10);
-                            break;
-                        }}
-                    }}
+                    const tileIndex = POS_TO_INDEX[targetCol + "," + targetRow] ?? -1;
 
                     if (tileIndex !== -1) {{
                         let className = 'mini-tile';
@@ -1,8 +1,11 @@
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import numpy as np
+import orjson
 import math
+import os
 from functools import lru_cache
 
 
@@ -12,6 +15,14 @@ class Puzzle(BaseModel):
     difficulty: str
 
 
+class ORJSONResponse(Response):
+    """JSON response rendered by orjson, which serializes NumPy arrays natively in C."""
+    media_type = "application/json"
+
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
 # --- FastAPI App Initialization ---
 app = FastAPI()
 origins = ["*"]
@@ -24,6 +35,23 @@ app.add_middleware(
 )
 
 
+# --- Shared Adjacency Layout ---
+def _freeze_adjacency(adj_list):
+    """
+    Packs a per-tile list of affected tiles into the immutable layout shared by every
+    board type: (adj_list, adj_csr_indptr, adj_csr_indices). adj_list[i] is a sorted tuple
+    and the affected tiles of i are also adj_csr_indices[adj_csr_indptr[i]:adj_csr_indptr[i + 1]].
+    """
+    adj_list = tuple(tuple(neighbors) for neighbors in adj_list)
+    adj_csr_indptr = np.zeros(len(adj_list) + 1, dtype=np.int32)
+    adj_csr_indptr[1:] = np.cumsum([len(neighbors) for neighbors in adj_list])
+    adj_csr_indices = np.fromiter((t for neighbors in adj_list for t in neighbors), dtype=np.int32)
+    # These arrays are handed out by lru_cache, so nobody may modify them in place
+    adj_csr_indptr.flags.writeable = False
+    adj_csr_indices.flags.writeable = False
+    return adj_list, adj_csr_indptr, adj_csr_indices
+
+
 # --- CORRECTED AND VERIFIED HEXAGON LOGIC ---
 @lru_cache(maxsize=None)
 def get_hexagon_board_details(radius=3):
@@ -33,67 +61,69 @@ def get_hexagon_board_details(radius=3):
     """
     print(f"[Solver] Pre-calculating hexagonal grid details using standard algorithm...")
 
-    axial_coords = set()
-    for q in range(-radius, radius + 1):
-        r1 = max(-radius, -q - radius)
-        r2 = min(radius, -q + radius)
-        for r in range(r1, r2 + 1):
-            axial_coords.add((q, r))
-
-    def axial_to_offset(q, r):
-        col, row = q, r + (q - (q & 1)) // 2
-        return (row, col)
+    Q, R_arr = np.meshgrid(np.arange(-radius, radius + 1), np.arange(-radius, radius + 1), indexing='ij')
+    cube_z = -Q - R_arr
+    valid = (np.abs(Q) + np.abs(R_arr) + np.abs(cube_z)) <= 2 * radius
+    qs, rs = Q[valid], R_arr[valid]
 
-    offset_coords_unnormalized = {axial_to_offset(q, r) for q, r in axial_coords}
-    if not offset_coords_unnormalized: return {}
+    # Tiles are indexed column by column, top to bottom, in "even-q" offset coordinates
+    cols, rows = qs, rs + (qs - (qs & 1)) // 2
+    order = np.lexsort((rows, cols))
+    qs, rs = qs[order], rs[order]
 
-    min_r, min_c = min(c[0] for c in offset_coords_unnormalized), min(c[1] for c in offset_coords_unnormalized)
-    valid_cells = {(r - min_r, c - min_c) for r, c in offset_coords_unnormalized}
-
-    offset_to_axial_map, axial_to_offset_map = {}, {}
-    for q, r in axial_coords:
-        norm_offset = (axial_to_offset(q, r)[0] - min_r, axial_to_offset(q, r)[1] - min_c)
-        offset_to_axial_map[norm_offset], axial_to_offset_map[(q, r)] = (q, r), norm_offset
+    # Dense (q, r) -> index table, padded by one cell so neighbor lookups never leave it
+    shift = radius + 1
+    axial_to_index = -np.ones((2 * radius + 3, 2 * radius + 3), dtype=np.int16)
+    axial_to_index[qs + shift, rs + shift] = np.arange(len(qs))
 
     axial_directions = [(+1, 0), (+1, -1), (0, -1), (-1, 0), (-1, +1), (0, +1)]
-    adjacency_map_by_coord = {cell: [cell] for cell in valid_cells}
-    for cell_offset in valid_cells:
-        start_axial = offset_to_axial_map[cell_offset]
+    adj_list = []
+    for idx, (q, r) in enumerate(zip(qs.tolist(), rs.tolist())):
+        neighbors = [idx]
         for dq, dr in axial_directions:
-            neighbor_axial = (start_axial[0] + dq, start_axial[1] + dr)
-            if neighbor_axial in axial_to_offset_map:
-                adjacency_map_by_coord[cell_offset].append(axial_to_offset_map[neighbor_axial])
+            nb = axial_to_index[q + shift + dq, r + shift + dr]
+            if nb >= 0: neighbors.append(int(nb))
+        adj_list.append(tuple(sorted(neighbors)))
+
+    return _freeze_adjacency(adj_list)
 
-    sorted_coords = sorted(list(valid_cells), key=lambda item: (item[1], item[0]))
-    coord_to_index = {coord: i for i, coord in enumerate(sorted_coords)}
-    adj_map_indices = {
-        coord_to_index[coord]: sorted([coord_to_index[n] for n in neighbors])
-        for coord, neighbors in adjacency_map_by_coord.items()
-    }
 
-    return adj_map_indices
+@lru_cache(maxsize=None)
+def _grid_adj(size_rc):
+    """Lists each square-grid tile with itself and its king-move neighbors, in index order."""
+    adj = []
+    for r in range(size_rc):
+        for c in range(size_rc):
+            neighbors = []
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    nr, nc = r + dr, c + dc
+                    if 0 <= nr < size_rc and 0 <= nc < size_rc: neighbors.append(nr * size_rc + nc)
+            adj.append(neighbors)
+    return _freeze_adjacency(adj)
 
 
 # --- Self-Verification Test (RESTORED) ---
+# These are the ground-truth test cases with the corrected list for tile 32.
+HEXAGON_TEST_CASES = {
+    18: [11, 12, 17, 18, 19, 24, 25],
+    32: [26, 27, 31, 32, 36],
+    21: [14, 20, 21, 27]
+}
+
+
 def run_backend_tests():
     """
-    Runs a one-time check when the server starts to verify the hexagon logic.
+    Runs a one-time check when the server starts (with SOLVER_SELFTEST=1) to verify the hexagon logic.
     Prints a simple PASS/FAIL report to the console.
     """
     print("\n--- Running Backend Hexagon Logic Verification ---")
-    adj_map = get_hexagon_board_details()
-
-    # These are the ground-truth test cases with the corrected list for tile 32.
-    test_cases = {
-        18: [11, 12, 17, 18, 19, 24, 25],
-        32: [26, 27, 31, 32, 36],
-        21: [14, 20, 21, 27]
-    }
+    adj_list = get_hexagon_board_details()[0]
     all_passed = True
 
-    for tile, expected_neighbors in test_cases.items():
-        actual_neighbors = adj_map.get(tile, [])
-        expected_neighbors.sort()
+    for tile, expected_neighbors in HEXAGON_TEST_CASES.items():
+        actual_neighbors = list(adj_list[tile]) if tile < len(adj_list) else []
+        expected_neighbors = sorted(expected_neighbors)
 
         if actual_neighbors == expected_neighbors:
             print(f"  [PASS] Tile {tile}")
@@ -111,44 +141,108 @@ def run_backend_tests():
     print("-" * 50 + "\n")
 
 
-# Run the verification when the application starts
-run_backend_tests()
+# Run the verification when the application starts, only if requested so each worker imports fast
+if os.environ.get("SOLVER_SELFTEST") == "1":
+    run_backend_tests()
 
 
 # --- Gaussian Elimination Solver ---
-def gaussian_elimination_mod(A, b, m):
-    """Solves Ax = b (mod m) using Gaussian elimination."""
+# Chinese Remainder Theorem table for expert mode: CRT6[a, b] is the k in 0..5 with k % 2 == a and k % 3 == b
+CRT6 = np.array([[0, 4, 2], [3, 1, 5]], dtype=np.int8)
+# Modular inverses of every invertible pivot value for the moduli the solver uses
+INV_MOD = {m: {a: pow(a, -1, m) for a in range(1, m) if math.gcd(a, m) == 1} for m in (2, 3, 4, 6)}
+
+
+def row_reduce_mod(A, B, m):
+    """
+    Gauss-Jordan reduces the augmented matrix [A | B] (mod m), where B holds one or more
+    right-hand side columns. Returns None if a pivot has no inverse modulo m.
+    """
     n = A.shape[0]
-    Ab = np.hstack([A.copy().astype(np.int64), b.copy().reshape(-1, 1).astype(np.int64)])
     print(f"[Solver] Performing Gaussian elimination modulo {m}...")
+    if m == 2: return row_reduce_gf2(A, B)
+    B = B.reshape(n, -1)
+    Ab = np.empty((n, n + B.shape[1]), dtype=np.int64)
+    Ab[:, :n] = A
+    Ab[:, n:] = B
 
     for i in range(n):
         pivot_row = i
         while pivot_row < n and Ab[pivot_row, i] == 0: pivot_row += 1
         if pivot_row == n: continue
         Ab[[i, pivot_row]] = Ab[[pivot_row, i]]
-        try:
-            inv = pow(int(Ab[i, i]), -1, m)
-        except ValueError:
-            return None
+        inv = INV_MOD[m].get(int(Ab[i, i]))
+        if inv is None: return None
         Ab[i] = (Ab[i] * inv) % m
+        # Clear column i in every other row with one broadcast update
+        factors = Ab[:, i].copy()
+        factors[i] = 0
+        Ab -= np.outer(factors, Ab[i])
+        Ab %= m
+    return Ab
+
+
+def row_reduce_gf2(A, B):
+    """
+    Gauss-Jordan reduces [A | B] (mod 2) with each row packed into a single Python int,
+    so every row operation is one XOR instead of a NumPy multiply and modulo.
+    """
+    n = A.shape[0]
+    B = B.reshape(n, -1)
+    width = n + B.shape[1]
+    rows = [
+        sum((int(A[i, j]) & 1) << j for j in range(n)) | sum((int(B[i, k]) & 1) << (n + k) for k in range(B.shape[1]))
+        for i in range(n)]
+
+    for i in range(n):
+        pivot_row = i
+        while pivot_row < n and not (rows[pivot_row] >> i) & 1: pivot_row += 1
+        if pivot_row == n: continue
+        rows[i], rows[pivot_row] = rows[pivot_row], rows[i]
         for j in range(n):
-            if i != j: Ab[j] = (Ab[j] - Ab[j, i] * Ab[i]) % m
-    if np.any(np.all(Ab[:, :-1] == 0, axis=1) & (Ab[:, -1] != 0)): return None
-
-    x = np.zeros(n, dtype=int)
-    for i in range(n - 1, -1, -1):
-        if Ab[i, i] == 1:
-            val = Ab[i, -1] - np.dot(Ab[i, i + 1:-1], x[i + 1:])
-            x[i] = val % m
-        else:
-            x[i] = 0
-    return x
+            if j != i and (rows[j] >> i) & 1: rows[j] ^= rows[i]
 
+    return np.array([[(row >> j) & 1 for j in range(width)] for row in rows], dtype=np.int64)
 
-# --- Main Solver Function ---
-def solve(initial_board, difficulty):
-    # Determine grid properties from difficulty
+
+def build_reduction(A, m):
+    """
+    Row-reduces [A | I] (mod m) once so any later system Ax = b (mod m) needs only two
+    matrix-vector products. Returns (solve_matrix, check_matrix): the system is consistent
+    when check_matrix @ b is 0 (mod m), and then x = solve_matrix @ b (mod m). A column
+    without a pivot is a free variable and stays at 0.
+    """
+    n = A.shape[0]
+    Ab = row_reduce_mod(A, np.eye(n, dtype=np.int64), m)
+    if Ab is None: return None
+    R, P = Ab[:, :n], Ab[:, n:]
+    # Entries are residues below m <= 6, so int8 storage keeps both matrices tiny and cache resident
+    solve_matrix = (P * (np.diag(R) == 1)[:, None]).astype(np.int8)
+    check_matrix = P[np.all(R == 0, axis=1)].astype(np.int8)
+    # Both matrices end up in get_solver_matrices' lru_cache, so nobody may modify them in place
+    solve_matrix.flags.writeable = False
+    check_matrix.flags.writeable = False
+    return solve_matrix, check_matrix
+
+
+def solve_with_reduction(reduction, b, m):
+    """
+    Solves Ax = b (mod m) using a reduction cached by build_reduction. The products are
+    taken in int16, which holds any sum of 37 products of residues below 6.
+    """
+    solve_matrix, check_matrix = reduction
+    b = b.astype(np.int16)
+    if np.any(np.matmul(check_matrix, b, dtype=np.int16) % m != 0): return None
+    return np.matmul(solve_matrix, b, dtype=np.int16) % m
+
+
+@lru_cache(maxsize=None)
+def get_solver_matrices(difficulty):
+    """
+    Builds and caches everything that depends only on the difficulty: the effects matrix,
+    its adjacency layout and the row-reduced systems used to solve every puzzle of that mode.
+    Expert mode (mod 6) keeps separate reductions mod 2 and mod 3 for the CRT step.
+    """
     if difficulty == 'easy':
         size_rc, modulus, layout = 3, 4, 'grid'
         n = size_rc * size_rc
@@ -156,81 +250,103 @@ def solve(initial_board, difficulty):
         size_rc, modulus, layout = 4, 4, 'grid'
         n = size_rc * size_rc
     elif difficulty == 'hard' or difficulty == 'expert':
-        n, modulus, layout = 37, (2 if difficulty == 'hard' else 6), 'hexagon'
+        size_rc, n, modulus, layout = None, 37, (2 if difficulty == 'hard' else 6), 'hexagon'
     else:
         return None
 
-    print(f"\n[Solver] Using Linear Algebra for '{difficulty}' mode (mod {modulus}, {n} tiles)...")
-
-    # Build the effects matrix 'A'
-    A = np.zeros((n, n), dtype=int)
+    # Build the effects matrix 'A' with one scatter of all (tile, button) pairs
     if layout == 'grid':
-        adj_map = {
-            k: [i for i in range(n) if abs(i // size_rc - k // size_rc) <= 1 and abs(i % size_rc - k % size_rc) <= 1]
-            for k in range(n)}
+        adjacency = _grid_adj(size_rc)
     else:
-        adj_map = get_hexagon_board_details()
+        adjacency = get_hexagon_board_details()
+
+    _, adj_csr_indptr, adj_csr_indices = adjacency
+    button_cols = np.repeat(np.arange(n, dtype=np.int32), np.diff(adj_csr_indptr))
+    A = np.zeros((n, n), dtype=np.int8)
+    A[adj_csr_indices, button_cols] = 1
+    # A is handed out by lru_cache, so nobody may modify it in place
+    A.flags.writeable = False
 
-    for button_idx, affected_list in adj_map.items():
-        for tile_idx in affected_list:
-            A[tile_idx, button_idx] = 1
+    reductions = {m: build_reduction(A, m) for m in ((2, 3) if difficulty == 'expert' else (modulus,))}
+    return A, adjacency, modulus, layout, size_rc, reductions
+
+
+# --- Main Solver Function ---
+def solve(initial_board, difficulty):
+    # Look up the cached matrices for this difficulty
+    matrices = get_solver_matrices(difficulty)
+    if matrices is None: return None
+    A, adjacency, modulus, layout, size_rc, reductions = matrices
+    _, adj_csr_indptr, adj_csr_indices = adjacency
+    n = A.shape[0]
+
+    print(f"\n[Solver] Using Linear Algebra for '{difficulty}' mode (mod {modulus}, {n} tiles)...")
+    if any(reduction is None for reduction in reductions.values()): return None
 
     # Create the target state vector 'b'
     initial_flat = np.array(initial_board).flatten()
-    b = (1 - initial_flat) % modulus
+    b = ((1 - initial_flat) % modulus).astype(np.int16)
 
     # Solve the system Ax = b for the number of presses 'x'
     if difficulty == 'expert':
-        x_mod2 = gaussian_elimination_mod(A, b % 2, 2)
-        x_mod3 = gaussian_elimination_mod(A, b % 3, 3)
+        x_mod2 = solve_with_reduction(reductions[2], b % 2, 2)
+        x_mod3 = solve_with_reduction(reductions[3], b % 3, 3)
         if x_mod2 is None or x_mod3 is None: return None
-        x = np.zeros(n, dtype=int)
-        for i in range(n):
-            for k in range(6):
-                if k % 2 == x_mod2[i] and k % 3 == x_mod3[i]:
-                    x[i] = k;
-                    break
+        x = CRT6[x_mod2, x_mod3]
     else:
-        x = gaussian_elimination_mod(A, b, modulus)
+        x = solve_with_reduction(reductions[modulus], b, modulus)
 
     if x is None: return None
 
+    # Sanity check: x already counts the presses per tile, so one product gives the final board
+    total_hits = np.matmul(A, x, dtype=np.int32)
+    final_board = ((initial_flat - 1 + total_hits) % modulus) + 1
+    if np.any(final_board != 1):
+        print("[Solver] Verification failed: the computed presses do not solve the board.")
+        return None
+
     # --- Build detailed solution steps for the frontend ---
     solution_steps = []
-    current_board = list(initial_flat)
 
-    click_path = []
+    # Each tile index is repeated once per press, in tile order
+    click_indices = np.repeat(np.arange(n, dtype=np.int32), x)
     if layout == 'grid':
-        for i, count in enumerate(x):
-            if count > 0: click_path.extend([[i // size_rc, i % size_rc]] * count)
+        click_path = np.stack([click_indices // size_rc, click_indices % size_rc], axis=1).tolist()
     else:
-        for i, count in enumerate(x):
-            if count > 0: click_path.extend([i] * count)
+        click_path = click_indices.tolist()
 
-    for click in click_path:
-        click_index = click if layout == 'hexagon' else click[0] * size_rc + click[1]
-        affected_tiles = adj_map.get(click_index, [])
+    # Row s of the cumulative sum is how many times each tile has been hit after click s.
+    # Tiles cycle through 1..modulus, so shift to 0-based before wrapping.
+    deltas = np.cumsum(A[:, click_indices].T, axis=0, dtype=np.int32)
+    board_states = ((initial_flat[None, :] - 1 + deltas) % modulus) + 1
 
-        # Apply the click to the current board state
-        for tile_idx in affected_tiles:
-            current_board[tile_idx] = ((current_board[tile_idx] - 1 + 1) % modulus) + 1
-
-        # --- THIS IS THE FIX ---
-        # The 'current_board' contains numpy.int64 types which are not JSON serializable.
-        # We must convert them to standard Python integers before appending.
+    # The NumPy rows and slices are left as arrays; ORJSONResponse serializes them directly
+    for click, click_index, board_state in zip(click_path, click_indices.tolist(), board_states):
         solution_steps.append({
             "click": click,
-            "affected_tiles": affected_tiles,
-            "board_state": [int(i) for i in current_board]  # Convert numpy types to python ints
+            "affected_tiles": adj_csr_indices[adj_csr_indptr[click_index]:adj_csr_indptr[click_index + 1]],
+            "board_state": board_state
         })
 
     print(f"[Solver] Calculation complete. Solution found in {len(solution_steps)} steps.")
     return solution_steps
 
 
+@lru_cache(maxsize=512)
+def _solve_cached(board_key, difficulty):
+    """
+    Full memoization of solve() (not just the last call): up to 512 distinct
+    (flattened board, difficulty) pairs are kept. The returned list is shared
+    between calls, so callers must not modify it.
+    """
+    return solve(board_key, difficulty)
+
+
 # --- API Endpoint ---
-@app.post("/solve")
+@app.post("/solve", response_class=ORJSONResponse)
 async def solve_puzzle(puzzle: Puzzle):
+    board_key = tuple(int(v) for v in np.asarray(puzzle.board).flatten())
     # The key is now "solution_steps" to match the frontend
-    solution = solve(puzzle.board, puzzle.difficulty)
-    return {"solution_steps": solution}
+    solution = _solve_cached(board_key, puzzle.difficulty)
+    # Returned as a Response so FastAPI's jsonable_encoder never walks the NumPy arrays
+    return ORJSONResponse({"solution_steps": solution})